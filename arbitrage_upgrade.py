@@ -1,16 +1,47 @@
 import asyncio
+import functools
 import json
 import logging
+import re
+import sys
+import time
+from collections import namedtuple
+from statistics import fmean
 from pathlib import Path
+from lxml import etree, html as lxml_html
 from playwright.async_api import async_playwright
-from urllib.parse import quote, quote_plus
+from urllib.parse import quote, quote_plus, urlsplit
 from config import KEY_PRICE_REF
 
+try:
+	import orjson
+except ImportError:  # orjson необязателен — без него работает стандартный json
+	orjson = None
+
 logger = logging.getLogger("tf2-arbitrage")
 UPGRADE_JSON_ALL = Path("upgrade_results_all.json")
 UPGRADE_JSON_PROFITABLE = Path("upgrade_results_profitable.json")
 
 
+def _json_loads(data: bytes):
+	return orjson.loads(data) if orjson else json.loads(data)
+
+
+def _json_dumps(obj) -> bytes:
+	return orjson.dumps(obj) if orjson else json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# "40.11 ref", "2.33 keys", "1 key 6.11 ref", "20 ref 1 key" (после удаления "~" и запятых)
+_PRICE_NUM = r"(?:\d+\.?\d*|\.\d+)"
+_PRICE_RE = re.compile(
+	rf"\s*(?:(?P<keys>{_PRICE_NUM})\s*keys?\b\s*)?"
+	rf"(?:(?P<ref>{_PRICE_NUM})\s*ref\b\s*)?"
+	rf"(?:(?P<keys_after>{_PRICE_NUM})\s*keys?\b\s*)?",
+	re.IGNORECASE,
+)
+
+
+@functools.lru_cache(maxsize=4096)
 def parse_price(text: str):
 	"""
 	Разбирает строку цены:
@@ -22,37 +53,20 @@ def parse_price(text: str):
 	if not text:
 		return None, None
 
-	text = text.replace("~", "").lower().strip()
-	text = text.replace(",", "")
-	parts = text.split()
-	if not parts:
-		return None, None
-
-	try:
-		# пример: "40 ref" или "2 keys"
-		if len(parts) == 2 and parts[1] in ["ref", "keys", "key"]:
-			if parts[1] == "ref":
-				return float(parts[0]), "ref"
-			else:
-				return float(parts[0]), "keys"
-
-		# пример: "1 key 20 ref"
-		if "key" in parts or "keys" in parts:
-			if "key" in parts:
-				key_index = parts.index("key")
-			else:
-				key_index = parts.index("keys")
-
-			keys_val = float(parts[key_index - 1])
-			ref_val = 0.0
-			if "ref" in parts:
-				ref_index = parts.index("ref")
-				ref_val = float(parts[ref_index - 1])
-			value = keys_val + (ref_val / 50.0)
-			return value, "keys"
-	except Exception:
+	m = _PRICE_RE.fullmatch(text.replace("~", "").replace(",", ""))
+	if m is None:
 		return None, None
-
+	keys, ref, keys_after = m.group("keys", "ref", "keys_after")
+	if keys is None:
+		keys = keys_after
+	elif keys_after is not None:
+		return None, None  # ключи указаны дважды
+	# пример: "1 key 20 ref" или "2 keys"
+	if keys is not None:
+		return float(keys) + (float(ref) / 50.0 if ref is not None else 0.0), "keys"
+	# пример: "40 ref"
+	if ref is not None:
+		return float(ref), "ref"
 	return None, None
 
 
@@ -61,78 +75,132 @@ ALIAS_BASE_NAMES = {
 }
 
 
-def parse_item_attributes(item_name: str):
+_ATTR_RE = re.compile(
+	r"^(?:(?P<strange>Strange)\s+)?"
+	r"(?:(?P<tier>Professional|Specialized)\s+Killstreak\s+|(?P<basic>Killstreak)\s+)?"
+	r"(?:(?P<australium>Australium)\s+)?"
+	r"(?P<base>.*)$",
+	re.IGNORECASE,
+)
+_KILLSTREAK_TIERS = {
+	"professional": 3,
+	"specialized": 2,
+}
+
+
+# Атрибуты предмета, разобранные из названия
+ItemAttrs = namedtuple("ItemAttrs", "quality killstreak_tier australium base_name")
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_item_attributes(item_name: str) -> ItemAttrs:
 	"""
 	Разбирает название предмета и определяет его атрибуты:
 	- quality: 6 (Unique), 11 (Strange)
 	- killstreak_tier: 0 (обычный), 1 (Basic Killstreak), 2 (Specialized Killstreak), 3 (Professional Killstreak)
 	- australium: True/False
 	- base_name: базовое название без префиксов
+	Все префиксы снимаются одним проходом регулярки; результат кэшируется.
 	"""
-	item_lower = item_name.lower()
-	
-	# Определяем качество
-	is_strange = item_lower.startswith("strange ")
-	quality = 11 if is_strange else 6
-	
-	# Определяем killstreak tier
-	killstreak_tier = 0
-	if "professional killstreak" in item_lower:
-		killstreak_tier = 3
-	elif "specialized killstreak" in item_lower:
-		killstreak_tier = 2
-	elif "killstreak" in item_lower:
-		killstreak_tier = 1  # Basic Killstreak
-	
-	# Определяем australium
-	australium = "australium" in item_lower
-	
-	# Убираем все префиксы для получения базового названия
-	base_name = item_name
-	if is_strange:
-		base_name = base_name.replace("Strange ", "").strip()
-	if "professional killstreak" in item_lower:
-		base_name = base_name.replace("Professional Killstreak ", "").strip()
-	elif "specialized killstreak" in item_lower:
-		base_name = base_name.replace("Specialized Killstreak ", "").strip()
-	elif "killstreak" in item_lower:
-		base_name = base_name.replace("Killstreak ", "").strip()
-	if australium:
-		base_name = base_name.replace("Australium ", "").strip()
+	m = _ATTR_RE.match(item_name)
+	tier = m.group("tier")
+	if tier:
+		killstreak_tier = _KILLSTREAK_TIERS[tier.lower()]
+	else:
+		killstreak_tier = 1 if m.group("basic") else 0  # 1 = Basic Killstreak
 
 	# Нормализуем неоднозначные имена (алиасы)
+	base_name = m.group("base").strip()
 	alias = ALIAS_BASE_NAMES.get(base_name.lower())
 	if alias:
 		base_name = alias
-	
-	return {
-		"quality": quality,
-		"killstreak_tier": killstreak_tier,
-		"australium": australium,
-		"base_name": base_name
-	}
+	# base_name — ключ кэшей _stats_name/_classifieds_name и общий для sell/buy/апгрейдов
+	# одного предмета: интернируем, чтобы все они делили одну строку
+	base_name = sys.intern(base_name)
+
+	return ItemAttrs(
+		quality=11 if m.group("strange") else 6,
+		killstreak_tier=killstreak_tier,
+		australium=bool(m.group("australium")),
+		base_name=base_name,
+	)
+
+
+# Одни и те же base_name кодируются в URL многократно (sell, buy, апгрейды)
+@functools.lru_cache(maxsize=512)
+def _stats_name(base_name: str) -> str:
+	return quote(base_name, safe="")
+
 
+@functools.lru_cache(maxsize=512)
+def _classifieds_name(base_name: str) -> str:
+	return quote_plus(base_name)  # classifieds prefer '+' for spaces
 
-async def _load_all_classifieds_orders(page, max_scrolls=8):
+
+_CLASSIFIEDS_URL_TPL = (
+	"https://backpack.tf/classifieds?item={enc}"
+	"&quality={q}&tradable=1&craftable=1&australium={au}&killstreak_tier={ks}"
+)
+_STATS_URL_TPL = "https://backpack.tf/stats/{quality}/{enc}/Tradable/Craftable"
+# stats ключа: по нему определяется цена ключа в ref, он же ключ записи в key_cache
+_KEY_STATS_URL = "https://backpack.tf/stats/Unique/Mann%20Co.%20Supply%20Crate%20Key/Tradable/Craftable"
+
+
+# ItemAttrs хешируем, а URL одного предмета нужен и для sell, и для buy, и в фолбеках
+@functools.lru_cache(maxsize=1024)
+def _classifieds_url(attrs: ItemAttrs) -> str:
+	return _CLASSIFIEDS_URL_TPL.format(
+		enc=_classifieds_name(attrs.base_name),
+		q=attrs.quality,
+		au="1" if attrs.australium else "-1",
+		ks=attrs.killstreak_tier,
+	)
+
+
+@functools.lru_cache(maxsize=1024)
+def _stats_url(attrs: ItemAttrs) -> str:
+	quality_str = "Strange" if attrs.quality == 11 else "Unique"
+	return _STATS_URL_TPL.format(quality=quality_str, enc=_stats_name(attrs.base_name))
+
+
+def _build_url(attrs: ItemAttrs, intent: str) -> str:
 	"""
-	Оптимизированная подгрузка ордеров на странице classifieds.
-	Уменьшено количество скроллов и задержки.
+	Основной URL цены предмета: classifieds для buy и для sell предметов со
+	сложными атрибутами (killstreak/australium), stats — для остальных sell.
 	"""
-	await asyncio.sleep(0.3)  # Уменьшено с 0.5
-	last_total = -1
-	
-	for i in range(max_scrolls):
-		await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-		await asyncio.sleep(0.4)  # Уменьшено с 0.6
-		
-		total = await page.locator('[data-listing_intent="buy"], [data-listing_intent="sell"]').count()
-		if total <= last_total:
-			break
-		last_total = total
-		
-		# Ранний выход если уже достаточно данных
-		if total >= 20:
-			break
+	if intent == "buy" or attrs.killstreak_tier > 0 or attrs.australium:
+		return _classifieds_url(attrs)
+	return _stats_url(attrs)
+
+
+# Все объявления classifieds (sell и buy) за один обход дерева
+_LISTING_XPATH = etree.XPath("//*[@data-listing_intent][@data-listing_price]")
+# Аналог селектора div.item[data-listing_intent="sell"] на страницах stats
+_STATS_SELL_PRICE_XPATH = etree.XPath(
+	'//div[contains(concat(" ", normalize-space(@class), " "), " item ")]'
+	'[@data-listing_intent="sell"]/@data-listing_price',
+	smart_strings=False,
+)
+
+# Заголовки для HTTP-запросов через context.request
+_HTTP_HEADERS = {"Accept-Language": "en-US,en;q=0.9"}
+# Маркер страницы stats для несуществующего предмета
+_STATS_NOT_EXIST = b"This item does not seem to exist"
+# Куки входа на backpack.tf: без них профиль не залогинен, сколько бы других кук ни было
+_LOGIN_COOKIES = frozenset(("stack[user]", "stack[hash]"))
+
+
+def _is_login_url(url: str) -> bool:
+	return "steamcommunity.com/openid/login" in url or "/login" in url
+
+
+def _has_listings(prices) -> bool:
+	"""
+	Есть ли в разобранной странице объявления (или явный ответ stats, что
+	предмета нет). Пустую страницу — заглушку Cloudflare, недогруженный
+	stats — не кэшируем, чтобы повтор сходил за ней заново.
+	"""
+	return prices.get("exists") is False or bool(prices.get("sell") or prices.get("buy"))
 
 
 def _to_keys_if_possible(value: float, currency: str, key_price_ref: float | None):
@@ -150,6 +218,29 @@ def _to_keys_if_possible(value: float, currency: str, key_price_ref: float | Non
 	return None, False
 
 
+def _keys_stream(price_texts, key_price_ref: float | None):
+	"""
+	Цены в ключах одним генератором: parse_price + конвертация; строки, которые
+	не разобрать или не перевести в ключи, пропускаются.
+	"""
+	return (
+		keys_val
+		for keys_val, ok in (_to_keys_if_possible(*parse_price(pt), key_price_ref) for pt in price_texts)
+		if ok
+	)
+
+
+def _average_price(price_texts) -> tuple[float | None, str | None]:
+	"""
+	Среднее по разобранным ценам, округлённое до сотых; валюта — первой
+	разобранной цены. (None, None), если не разобралась ни одна.
+	"""
+	parsed = [(val, curr) for val, curr in map(parse_price, price_texts) if val is not None]
+	if not parsed:
+		return None, None
+	return round(fmean(val for val, _ in parsed), 2), parsed[0][1]
+
+
 def _to_ref(value: float | None, currency: str | None, key_price_ref: float | None) -> float:
 	"""
 	Конвертирует значение в ref. Возвращает 0.0 если невозможно.
@@ -163,6 +254,88 @@ def _to_ref(value: float | None, currency: str | None, key_price_ref: float | No
 	return 0.0
 
 
+# Сколько секунд определённая цена ключа считается актуальной
+KEY_PRICE_TTL = 3600.0
+
+# Разница buy/min sell (в ключах), при которой buy уже не улучшить — дальше не листаем
+BUY_SELL_EPSILON = 0.01
+# Номера страниц classifieds, которые грузятся параллельно одной волной
+CLASSIFIEDS_PAGE_WAVES = ((1,), (2, 3), (4, 5))
+# Объявления отсортированы по цене: если на первой странице столько sell,
+# min sell и лучшие buy уже на ней и дальше можно не листать
+CLASSIFIEDS_ENOUGH_SELLS = 5
+# Страница с min sell выше глобального во столько раз уже не изменит min sell
+SELL_SETTLED_RATIO = 1.2
+
+# Цена предмета: value в currency ("ref"/"keys") и откуда она взята
+ItemPrice = namedtuple("ItemPrice", "value currency source")
+
+# Задача на загрузку цены: всё, что можно посчитать до запросов
+FetchTask = namedtuple("FetchTask", "item attrs url intent")
+
+# Результат для предмета, цену которого получить не удалось
+_EMPTY_PRICE = ItemPrice(0.0, "unknown", "None")
+
+
+class _BuyPageScan:
+	"""
+	Проход по страницам classifieds для buy без I/O: копит min sell и все buy
+	(в ключах) и решает, пора ли перестать листать.
+	"""
+
+	__slots__ = ("key_ref", "global_min_sell", "all_buys", "prev_sell_count", "sells_settled")
+
+	def __init__(self, key_ref: float | None):
+		self.key_ref = key_ref
+		self.global_min_sell = None
+		self.all_buys = []
+		self.prev_sell_count = 0
+		self.sells_settled = False
+
+	def best_buy(self) -> float | None:
+		"""
+		Лучший buy строго ниже min sell или None.
+		"""
+		if self.global_min_sell is None:
+			return None
+		return max((b for b in self.all_buys if b < self.global_min_sell), default=None)
+
+	def add_page(self, page_num: int, sell_texts, buy_texts) -> bool:
+		"""
+		Учитывает страницу page_num; True — следующие страницы не нужны.
+		"""
+		page_min = min(_keys_stream(sell_texts, self.key_ref), default=None)
+		if page_min is not None:
+			if self.global_min_sell is None or page_min < self.global_min_sell:
+				self.global_min_sell = page_min
+
+		# Лучший buy до этой страницы — чтобы понять, улучшила ли она результат
+		prev_best = self.best_buy()
+		self.all_buys.extend(_keys_stream(buy_texts, self.key_ref))
+
+		logger.info(f"[Arbitrage][BUY] page={page_num}, page_min={page_min}, global_min={self.global_min_sell}, buys={len(self.all_buys)}")
+
+		if page_num == 1 and len(sell_texts) >= CLASSIFIEDS_ENOUGH_SELLS and self.best_buy() is not None:
+			return True
+
+		if len(sell_texts) <= self.prev_sell_count or (
+			page_min is not None and page_min > self.global_min_sell * SELL_SETTLED_RATIO
+		):
+			self.sells_settled = True
+		else:
+			self.prev_sell_count = len(sell_texts)
+
+		# Стоп, когда новые sell больше не появляются и лучший buy ниже min sell
+		# уже не улучшить: он вплотную к min sell или страница его не подняла
+		if self.sells_settled:
+			if self.global_min_sell is None:
+				return True
+			best_buy = self.best_buy()
+			if best_buy is not None and (self.global_min_sell - best_buy < BUY_SELL_EPSILON or best_buy == prev_best):
+				return True
+		return False
+
+
 KIT_COSTS_REF = {
 	"specialized": 48.5,   # диапазон 47-50 ref, берём среднее
 	"professional": 124.0, # 2 keys 20 ref при key≈52 → 124 ref
@@ -183,7 +356,7 @@ def _kit_item_name(base_item: str, kit_type: str) -> str:
 	return f"Strange {kit_name} {base_clean}"
 
 
-async def _analyze_upgrades_for_items(self, page, base_items, key_price_ref: float | None, kit_types=("specialized", "professional")):
+async def _analyze_upgrades_for_items(self, base_items, key_price_ref: float | None, kit_types=("specialized", "professional")):
 	"""
 	Для каждого base_item проверяет условие sell_A + kit_cost < buy_B.
 	Возвращает список словарей с результатами.
@@ -191,12 +364,23 @@ async def _analyze_upgrades_for_items(self, page, base_items, key_price_ref: flo
 	results = []
 	if not base_items:
 		return results
+	# Получаем sell_A для всех предметов одним параллельным батчем
+	sell_data = await self.fetch_prices(base_items, "sell")
+	# ...и buy_B для всех апгрейдов тех предметов, у которых есть sell_A
+	upgraded_names = []
 	for base_item in base_items:
-		# Получаем sell_A
-		sell_data = await self.fetch_prices(page, [base_item], "sell")
-		sell_entry = sell_data.get(base_item, {})
-		sell_value = sell_entry.get("value")
-		sell_currency = sell_entry.get("currency")
+		sell_entry = sell_data.get(base_item, _EMPTY_PRICE)
+		if _to_ref(sell_entry.value, sell_entry.currency, key_price_ref or KEY_PRICE_REF) <= 0:
+			continue
+		for kit in kit_types:
+			if KIT_COSTS_REF.get(kit):
+				upgraded_name = _kit_item_name(base_item, kit)
+				logger.info(f"[UpgradeCheck] Проверяю {upgraded_name} (buy)")
+				upgraded_names.append(upgraded_name)
+	buy_data = await self.fetch_prices(upgraded_names, "buy")
+
+	for base_item in base_items:
+		sell_value, sell_currency, _ = sell_data.get(base_item, _EMPTY_PRICE)
 		sell_ref = _to_ref(sell_value, sell_currency, key_price_ref or KEY_PRICE_REF)
 		if sell_ref <= 0:
 			continue
@@ -206,11 +390,7 @@ async def _analyze_upgrades_for_items(self, page, base_items, key_price_ref: flo
 				if not kit_cost:
 					continue
 				upgraded_name = _kit_item_name(base_item, kit)
-				logger.info(f"[UpgradeCheck] Проверяю {upgraded_name} (buy)")
-				buy_data = await self.fetch_prices(page, [upgraded_name], "buy")
-				buy_entry = buy_data.get(upgraded_name, {})
-				buy_value = buy_entry.get("value")
-				buy_currency = buy_entry.get("currency")
+				buy_value, buy_currency, _ = buy_data.get(upgraded_name, _EMPTY_PRICE)
 				buy_ref = _to_ref(buy_value, buy_currency, key_price_ref or KEY_PRICE_REF)
 				total_cost = sell_ref + kit_cost
 				break_even_ref = total_cost
@@ -259,20 +439,129 @@ async def _analyze_upgrades_for_items(self, page, base_items, key_price_ref: flo
 	return results
 
 
-def _is_closed_error(e: Exception) -> bool:
-	msg = str(e).lower()
-	return (
-		"has been closed" in msg or
-		"target page" in msg and "closed" in msg or
-		"context" in msg and "closed" in msg or
-		"browser" in msg and "closed" in msg
-	)
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+# Сторонняя аналитика и реклама: скрипты грузятся как "script", по типу их не отсечь
+BLOCKED_HOSTS = (
+	"google-analytics.com",
+	"googletagmanager.com",
+	"doubleclick.net",
+	"googlesyndication.com",
+	"adservice.google.com",
+	"quantserve.com",
+	"scorecardresearch.com",
+)
+# Картинки и шрифты, пришедшие с другим resource_type (preload, fetch из скриптов)
+BLOCKED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".ico", ".woff", ".woff2", ".ttf")
+
+
+async def _block_heavy_resources(route):
+	"""
+	Отбрасывает картинки, шрифты (по типу и по расширению), стили, медиа и
+	стороннюю аналитику — для цен нужен только HTML с атрибутами data-listing_*.
+	"""
+	request = route.request
+	parts = urlsplit(request.url)
+	if (
+		request.resource_type in BLOCKED_RESOURCE_TYPES
+		or (parts.hostname or "").endswith(BLOCKED_HOSTS)
+		or parts.path.lower().endswith(BLOCKED_SUFFIXES)
+	):
+		await route.abort()
+	else:
+		await route.continue_()
+
+
+class PriceCache:
+	"""
+	Дисковый кэш разобранных цен по URL (stale-while-revalidate):
+	- запись моложе fresh_ttl отдаётся без загрузки страницы;
+	- моложе stale_ttl — отдаётся сразу, а обновляется в фоне;
+	- более старая считается отсутствующей.
+	Файл читается в load(), а не в конструкторе — чтобы его можно было
+	вынести из event loop в отдельный поток.
+	"""
+
+	__slots__ = ("path", "fresh_ttl", "stale_ttl", "_entries")
+
+	def __init__(self, path: Path, fresh_ttl: float = 60.0, stale_ttl: float = 600.0):
+		self.path = path
+		self.fresh_ttl = fresh_ttl
+		self.stale_ttl = stale_ttl
+		self._entries = {}  # url -> [timestamp, prices]
+
+	def load(self) -> None:
+		if self.path.exists():
+			try:
+				self._entries = _json_loads(self.path.read_bytes())
+			except Exception as e:
+				logger.warning(f"[Cache] Не удалось прочитать {self.path}: {e}")
+
+	def get(self, url: str):
+		"""
+		Возвращает (prices, age) или (None, None), если записи нет или она просрочена.
+		"""
+		entry = self._entries.get(url)
+		if entry is None:
+			return None, None
+		ts, prices = entry
+		age = time.time() - ts
+		if age > self.stale_ttl:
+			return None, None
+		return prices, age
+
+	def set(self, url: str, prices) -> None:
+		self._entries[url] = [time.time(), prices]
+
+	def save(self) -> None:
+		now = time.time()
+		alive = {url: entry for url, entry in self._entries.items() if now - entry[0] <= self.stale_ttl}
+		try:
+			self.path.write_bytes(_json_dumps(alive))
+		except Exception as e:
+			logger.error(f"[Cache] Не удалось сохранить {self.path}: {e}")
+
+
+class _AsyncTokenBucket:
+	"""
+	Token bucket для asyncio: в среднем не больше rate запросов в секунду,
+	с допустимым всплеском до burst запросов подряд.
+	"""
+
+	__slots__ = ("rate", "burst", "_tokens", "_last")
+
+	def __init__(self, rate: float, burst: int = 1):
+		self.rate = rate
+		self.burst = burst
+		self._tokens = float(burst)
+		self._last = time.monotonic()
+
+	async def acquire(self) -> None:
+		now = time.monotonic()
+		self._tokens = min(float(self.burst), self._tokens + (now - self._last) * self.rate)
+		self._last = now
+		wait = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+		# Токен резервируется сразу, ждём уже после — очередь не перемешивается
+		self._tokens -= 1.0
+		if wait > 0:
+			await asyncio.sleep(wait)
 
 
 class UpgradeArbitrage:
+	__slots__ = (
+		"cookies_file", "config_file", "profile_dir",
+		"sell_items", "buy_items", "price_mode",
+		"upgrade_items", "upgrade_kits", "focus_upgrade",
+		"cached_sell", "_key_lock",
+		"concurrency", "requests_per_sec", "_slots", "_bucket", "price_cache", "key_cache", "_inflight", "_revalidations",
+		"_session_lock", "_session_gen", "_session_renewed",
+		"max_retries", "retry_delay",
+		"_pw", "_context",
+	)
+
 	def __init__(self):
 		self.cookies_file = Path("cookies.json")
 		self.config_file = Path("config.json")
+		self.profile_dir = Path.home() / ".tf2arb_profile"
 
 		self.sell_items = []
 		self.buy_items = []
@@ -281,391 +570,435 @@ class UpgradeArbitrage:
 		self.upgrade_kits = []  # allowed: "specialized", "professional"
 		self.focus_upgrade = False
 		self.cached_sell = {}
-		self.cached_attributes = {}  # Кэш для парсинга атрибутов
-		self.runtime_key_price_ref = None  # определяем динамически, если не задано в конфиге
-		
-		# Оптимизированные настройки
-		self.delays = {
-			"page_load": 0.4,      # Уменьшено с 0.5
-			"between_requests": 0.4, # Уменьшено с 0.6
-			"scroll": 0.4,          # Уменьшено с 0.6
-			"retry": 0.2            # Новое - для retry
-		}
-		
+		self._key_lock = asyncio.Lock()
+
+		# Параллельная загрузка: число одновременных запросов (config.json: "concurrency")
+		self.concurrency = 3
+		self._slots = None  # asyncio.Semaphore на concurrency, создаётся в start()
+		# Темп запросов к backpack.tf (config.json: "requests_per_sec")
+		self.requests_per_sec = 10.0
+		self._bucket = None  # _AsyncTokenBucket, создаётся в start()
+
+		# Playwright и контекст браузера живут между start() и close()
+		self._pw = None
+		self._context = None
+
+		# Кэш разобранных цен по URL между запусками
+		self.price_cache = PriceCache(Path("price_cache.json"))
+		# Цена ключа меняется за часы, а не минуты — держим её отдельно и дольше
+		self.key_cache = PriceCache(Path("key_price_cache.json"), fresh_ttl=KEY_PRICE_TTL, stale_ttl=KEY_PRICE_TTL)
+		self._inflight = {}  # url -> задача загрузки, которую делят одновременные запросы
+		self._revalidations = {}  # url -> фоновая задача обновления кэша
+		# Повторный прогрев при истёкшей сессии: один на все запросы, получившие отказ,
+		# и не больше одного за run() — дальше отказ уходит в повторы с backoff
+		self._session_lock = asyncio.Lock()
+		self._session_gen = 0
+		self._session_renewed = False
+
 		# Retry настройки
 		self.max_retries = 2
 		self.retry_delay = 1.0
-		
+
+	async def _load_config(self):
+		"""
+		Читает config.json в отдельном потоке, не блокируя event loop (orjson, если установлен).
+		"""
 		if self.config_file.exists():
 			try:
-				config = json.loads(self.config_file.read_text())
-				self.sell_items = config.get("sell_items", [])
-				self.buy_items = config.get("buy_items", [])
+				config = _json_loads(await asyncio.to_thread(self.config_file.read_bytes))
+				# Дубликаты в списках дали бы лишние загрузки — убираем, сохраняя порядок
+				self.sell_items = list(dict.fromkeys(config.get("sell_items", [])))
+				self.buy_items = list(dict.fromkeys(config.get("buy_items", [])))
 				self.price_mode = config.get("price_mode", "avg23")
-				self.upgrade_items = config.get("upgrade_items", [])
+				self.upgrade_items = list(dict.fromkeys(config.get("upgrade_items", [])))
 				self.upgrade_kits = config.get("upgrade_kits", [])
 				self.focus_upgrade = bool(config.get("focus_upgrade", False))
+				self.concurrency = max(1, int(config.get("concurrency", self.concurrency)))
+				# 0 и меньше дали бы деление на ноль в _AsyncTokenBucket — не медленнее запроса в 10 с
+				self.requests_per_sec = max(0.1, float(config.get("requests_per_sec", self.requests_per_sec)))
 			except Exception as e:
 				logger.error(f"[Arbitrage] Ошибка при загрузке config.json: {e}")
-
-	def _get_cached_attributes(self, item_name: str):
-		"""
-		Получает атрибуты предмета из кэша или парсит заново
-		"""
-		if item_name not in self.cached_attributes:
-			self.cached_attributes[item_name] = parse_item_attributes(item_name)
-		return self.cached_attributes[item_name]
 	
-	async def _detect_key_price_ref(self, page) -> float | None:
+	async def _detect_key_price_ref(self) -> float | None:
 		"""
 		Пытается определить цену ключа в ref, если KEY_PRICE_REF не задан:
-		идёт на stats ключа и берёт минимальный sell в ref.
+		идёт на stats ключа и берёт минимальный sell в ref. Результат живёт
+		в key_price_cache.json KEY_PRICE_TTL секунд.
 		"""
+		cached, age = self.key_cache.get(_KEY_STATS_URL)
+		if cached is not None:
+			logger.info(f"[Arbitrage] Цена ключа из кэша: ~{cached:.2f} ref ({age / 60:.0f} мин назад)")
+			return cached
 		try:
-			key_stats = "https://backpack.tf/stats/Unique/Mann%20Co.%20Supply%20Crate%20Key/Tradable/Craftable"
-			await page.goto(key_stats, timeout=90000, wait_until="domcontentloaded")
-			await page.locator('div.item[data-listing_intent="sell"]').first.wait_for(state="attached", timeout=90000)
-			await asyncio.sleep(self.delays["page_load"])
-			sell_prices = await page.locator('div.item[data-listing_intent="sell"]').evaluate_all(
-				"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-			)
-			candidates = []
-			for pt in sell_prices:
-				val, curr = parse_price(pt)
-				# для ключа ожидаем цены в ref
-				if val is not None and curr == "ref":
-					candidates.append(val)
-			if candidates:
-				est = min(candidates)
+			sell_prices = (await self._load_stats_listings(_KEY_STATS_URL))["sell"]
+			# для ключа ожидаем цены в ref
+			est = min((val for val, curr in map(parse_price, sell_prices) if val is not None and curr == "ref"), default=None)
+			if est is not None:
 				logger.info(f"[Arbitrage] Обнаружена цена ключа: ~{est:.2f} ref")
+				self.key_cache.set(_KEY_STATS_URL, est)
+				await asyncio.to_thread(self.key_cache.save)
 				return est
 		except Exception as e:
 			logger.warning(f"[Arbitrage] Не удалось определить цену ключа через stats: {e}")
 		return None
 
-	async def fetch_prices(self, page, items, intent):
-		results = {}
-		for item in items:
-			# Оптимизированная пауза между запросами
-			await asyncio.sleep(self.delays["between_requests"])
-			
-			# Retry логика для обработки ошибок
-			for retry in range(self.max_retries + 1):
-				try:
-					if intent == "buy":
-						logger.info(f"[Arbitrage] Загружаю {item} (buy) через classifieds (scraping only)...")
-
-						# Парсим атрибуты предмета (с кэшированием)
-						item_attrs = self._get_cached_attributes(item)
-						logger.info(f"[Arbitrage][BUY] Атрибуты {item}: quality={item_attrs['quality']}, killstreak_tier={item_attrs['killstreak_tier']}, australium={item_attrs['australium']}, base_name='{item_attrs['base_name']}'")
-						item_enc = quote_plus(item_attrs["base_name"])  # classifieds prefer '+' for spaces
-						
-						# Определяем параметр australium
-						australium_param = "1" if item_attrs["australium"] else "-1"
-						
-						base_url = (
-							f"https://backpack.tf/classifieds?item={item_enc}"
-							f"&quality={item_attrs['quality']}&tradable=1&craftable=1&australium={australium_param}&killstreak_tier={item_attrs['killstreak_tier']}"
-						)
-
-						# Определяем цену ключа в ref (если не задана в конфиге) один раз за сессию
-						effective_key_ref = KEY_PRICE_REF or self.runtime_key_price_ref
-						if not effective_key_ref:
-							self.runtime_key_price_ref = await self._detect_key_price_ref(page)
-							effective_key_ref = self.runtime_key_price_ref
-
-						# PASS 1: глобальный min SELL (в ключах; конвертируем ref при необходимости)
-						global_min_sell = None
-						prev_sell_count = 0
-						max_pages = 5
-						for page_num in range(1, max_pages + 1):
-							url = base_url if page_num == 1 else f"{base_url}&page={page_num}"
-							logger.info(f"[Arbitrage][BUY/P1] URL → {url}")
-							await page.goto(url, timeout=90000, wait_until="domcontentloaded")
-							await asyncio.sleep(self.delays["page_load"])
-							await page.locator('[data-listing_intent="sell"], [data-listing_intent="buy"]').first.wait_for(state="attached", timeout=90000)
-							await _load_all_classifieds_orders(page)
-
-							page_sell_prices = await page.locator('[data-listing_intent="sell"]').evaluate_all(
-								"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-							)
-
-							page_min = None
-							for pt in page_sell_prices:
-								val, curr = parse_price(pt)
-								if val is None:
-									continue
-								keys_val, ok = _to_keys_if_possible(val, curr, effective_key_ref)
-								if not ok:
-									continue
-								if page_min is None or keys_val < page_min:
-									page_min = keys_val
-							if page_min is not None:
-								if global_min_sell is None or page_min < global_min_sell:
-									global_min_sell = page_min
-
-							logger.info(f"[Arbitrage][BUY/P1] page={page_num}, page_min={page_min}, global_min={global_min_sell}")
-
-							if len(page_sell_prices) <= prev_sell_count:
-								break
-							prev_sell_count = len(page_sell_prices)
-
-							await asyncio.sleep(self.delays["between_requests"])
-
-						if global_min_sell is None:
-							logger.warning(f"[Arbitrage] Нет пригодных SELL объявлений для {item} (keys/конверсия)")
-							results[item] = {"value": 0.0, "currency": "unknown", "source": "None"}
-							continue
-							
-						# PASS 2: ранний стоп — ищем buy < global_min_sell (в ключах; конвертируем ref при необходимости)
-						best_buy = None
-						for page_num in range(1, max_pages + 1):
-							url = base_url if page_num == 1 else f"{base_url}&page={page_num}"
-							logger.info(f"[Arbitrage][BUY/P2] URL → {url}")
-							await page.goto(url, timeout=90000, wait_until="domcontentloaded")
-							await asyncio.sleep(self.delays["page_load"])
-							# На некоторых страницах могут отсутствовать buy, поэтому проверяем наличие
-							has_buy = await page.locator('[data-listing_intent="buy"]').count()
-							if has_buy == 0:
-								logger.info(f"[Arbitrage][BUY/P2] page={page_num} buy=0")
-								await asyncio.sleep(0.4)
-								continue
-							
-							await page.locator('[data-listing_intent="buy"]').first.wait_for(state="attached", timeout=90000)
-							await _load_all_classifieds_orders(page)
-
-							page_buy_prices = await page.locator('[data-listing_intent="buy"]').evaluate_all(
-								"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-							)
-
-							candidates = []
-							for pt in page_buy_prices:
-								val, curr = parse_price(pt)
-								if val is None:
-									continue
-								keys_val, ok = _to_keys_if_possible(val, curr, effective_key_ref)
-								if ok and keys_val < global_min_sell:
-									candidates.append(keys_val)
-
-							if candidates:
-								best_buy = max(candidates)
-								logger.info(f"[Arbitrage][BUY/P2] Early stop on page {page_num}: buy={best_buy:.2f} keys < global min sell={global_min_sell:.2f}")
-								break
-							
-							await asyncio.sleep(self.delays["between_requests"])
-
-						if best_buy is not None:
-							results[item] = {"value": round(best_buy, 2), "currency": "keys", "source": "ClassifiedsVerified"}
-						else:
-							logger.warning(f"[Arbitrage] Не нашёл buy ниже глобального min sell для {item}")
-							results[item] = {"value": 0.0, "currency": "unknown", "source": "None"}
+	async def _ensure_key_price_ref(self) -> float | None:
+		"""
+		Цена ключа в ref: из конфига, либо из key_cache, пока она моложе
+		KEY_PRICE_TTL, — так и повторные run() одной сессии её обновляют.
+		Lock не даёт нескольким воркерам одновременно ходить на stats ключа.
+		"""
+		if KEY_PRICE_REF:
+			return KEY_PRICE_REF
+		cached, _ = self.key_cache.get(_KEY_STATS_URL)
+		if cached is None:
+			async with self._key_lock:
+				# пока ждали lock, цену мог определить другой воркер
+				cached, _ = self.key_cache.get(_KEY_STATS_URL)
+				if cached is None:
+					cached = await self._detect_key_price_ref()
+		return cached
+
+	async def _new_page(self, context):
+		page = await context.new_page()
+		await page.set_extra_http_headers({"Accept-Language": "en-US,en;q=0.9"})
+		
+		# Оптимизация производительности страницы
+		await page.add_init_script("""
+			// Отключаем ненужные функции для ускорения
+			Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+			Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+			Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
+		""")
+		return page
+
+	async def _fetch_html(self, url):
+		"""
+		GET url обычным HTTP-запросом через context.request (куки общие с браузером).
+		Объявления есть в серверном HTML, поэтому рендер, скрипты и скролл не нужны.
+		Одновременно идёт не больше concurrency запросов, темп ограничен token bucket.
+		На 403 или редирект на логин — прогрев (и вход) заново и один повтор;
+		если прогрев в этом run() уже был, бросает исключение.
+		Возвращает (status, body).
+		"""
+		session_gen = self._session_gen
+		status, body, final_url = await self._request_html(url)
+		if status == 403 or _is_login_url(final_url):
+			if not await self._renew_session(session_gen):
+				raise Exception(f"HTTP {status} для {url}: сессия backpack.tf не восстановилась после прогрева")
+			status, body, _ = await self._request_html(url)
+		return status, body
+
+	async def _request_html(self, url):
+		async with self._slots:
+			await self._bucket.acquire()
+			resp = await self._context.request.get(url, headers=_HTTP_HEADERS, timeout=90000)
+			try:
+				return resp.status, await resp.body(), resp.url
+			finally:
+				# Иначе тело ответа живёт в драйвере до закрытия контекста, а он
+				# переживает повторные run()
+				await resp.dispose()
 
-					else:
-						logger.info(f"[Arbitrage] Загружаю {item} (sell)...")
-
-						# Парсим атрибуты предмета (с кэшированием)
-						item_attrs = self._get_cached_attributes(item)
-						logger.info(f"[Arbitrage][SELL] Атрибуты {item}: quality={item_attrs['quality']}, killstreak_tier={item_attrs['killstreak_tier']}, australium={item_attrs['australium']}, base_name='{item_attrs['base_name']}'")
-						
-						# Определяем, нужно ли использовать classifieds вместо stats
-						use_classifieds = item_attrs["killstreak_tier"] > 0 or item_attrs["australium"]
-						
-						if use_classifieds:
-							logger.info(f"[Arbitrage] Используем classifieds для {item} (сложные атрибуты)")
-							
-							# Используем classifieds для sell (как для buy)
-							item_enc = quote_plus(item_attrs["base_name"])  # classifieds prefer '+' for spaces
-							australium_param = "1" if item_attrs["australium"] else "-1"
-							
-							base_url = (
-								f"https://backpack.tf/classifieds?item={item_enc}"
-								f"&quality={item_attrs['quality']}&tradable=1&craftable=1&australium={australium_param}&killstreak_tier={item_attrs['killstreak_tier']}"
-							)
-							
-							# Получаем sell цены через classifieds
-							url = base_url
-							logger.info(f"[Arbitrage][SELL] Classifieds URL → {url}")
-							await page.goto(url, timeout=90000, wait_until="domcontentloaded")
-							await asyncio.sleep(self.delays["page_load"])
-							await page.locator('[data-listing_intent="sell"]').first.wait_for(state="attached", timeout=90000)
-							await _load_all_classifieds_orders(page)
-							
-							sell_prices = await page.locator('[data-listing_intent="sell"]').evaluate_all(
-								"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-							)
-							
-							logger.info(f"[DEBUG] Нашёл {len(sell_prices)} sell объявлений в classifieds для {item}: {sell_prices}")
-							
-							if self.price_mode == "first":
-								price_texts = sell_prices[:1]
-							elif self.price_mode == "avg23" and len(sell_prices) >= 3:
-								price_texts = sell_prices[1:3]
-							else:
-								price_texts = sell_prices[:1]
-							
-							values = []
-							currency = None
-							for pt in price_texts:
-								val, curr = parse_price(pt)
-								if val is not None:
-									values.append(val)
-									if not currency:
-										currency = curr
-							
-							if values:
-								avg_value = sum(values) / len(values)
-								rounded_value = round(avg_value, 2)
-								self.cached_sell[item] = rounded_value
-								price_text = f"{rounded_value:.2f} {currency}"
-								source = "ClassifiedsSell"
-								logger.info(f"[Arbitrage] Цена {item} (sell): {price_text} ({source})")
-								results[item] = {
-									"value": rounded_value,
-									"currency": currency,
-									"source": source
-								}
-							else:
-								raise Exception("Не удалось разобрать цены из classifieds")
-						
-						else:
-							logger.info(f"[Arbitrage] Используем stats для {item} (простые атрибуты)")
-							
-							# Используем stats для простых предметов
-							if item_attrs["quality"] == 11:
-								quality_str = "Strange"
-							else:
-								quality_str = "Unique"
-							
-							item_enc = quote(item_attrs["base_name"], safe="")
-							url = f"https://backpack.tf/stats/{quality_str}/{item_enc}/Tradable/Craftable"
-							
-							logger.info(f"[Arbitrage][SELL] Stats URL → {url}")
-							await page.goto(url, timeout=90000, wait_until="domcontentloaded")
-							logger.info(f"[Arbitrage][SELL] At → {page.url}")
-
-							# Если предмета нет на stats, пробуем через classifieds
-							not_exist = await page.locator("text=This item does not seem to exist").count()
-							if not_exist and not_exist > 0:
-								logger.warning(f"[Arbitrage][SELL] Stats сообщает: 'This item does not seem to exist.' — переключаюсь на classifieds для {item}")
-								item_enc_f = quote_plus(item_attrs["base_name"])  # classifieds prefer '+' for spaces
-								australium_param_f = "1" if item_attrs["australium"] else "-1"
-								class_url = (
-									f"https://backpack.tf/classifieds?item={item_enc_f}"
-									f"&quality={item_attrs['quality']}&tradable=1&craftable=1&australium={australium_param_f}&killstreak_tier={item_attrs['killstreak_tier']}"
-								)
-								logger.info(f"[Arbitrage][SELL] Fallback Classifieds URL → {class_url}")
-								await page.goto(class_url, timeout=90000, wait_until="domcontentloaded")
-								await asyncio.sleep(self.delays["page_load"])
-								cnt = await page.locator('[data-listing_intent="sell"]').count()
-								if cnt > 0:
-									await _load_all_classifieds_orders(page)
-									sell_prices_fb = await page.locator('[data-listing_intent="sell"]').evaluate_all(
-										"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-									)
-									logger.info(f"[DEBUG] (FB) Нашёл {len(sell_prices_fb)} sell объявлений для {item}: {sell_prices_fb}")
-									price_texts = sell_prices_fb[:1] if sell_prices_fb else []
-									values = []
-									currency = None
-									for pt in price_texts:
-										val, curr = parse_price(pt)
-										if val is not None:
-											values.append(val)
-											if not currency:
-												currency = curr
-									if values:
-										avg_value = sum(values) / len(values)
-										rounded_value = round(avg_value, 2)
-										results[item] = {"value": rounded_value, "currency": currency, "source": "ClassifiedsSellFB"}
-										logger.info(f"[Arbitrage] (FB) Цена {item} (sell): {rounded_value} {currency} (ClassifiedsSellFB)")
-										# Переходим к следующему предмету
-										break
-								else:
-									logger.warning(f"[Arbitrage][SELL] (FB) Нет sell объявлений для {item}")
-									results[item] = {"value": 0.0, "currency": "unknown", "source": "None"}
-									break
- 
-							selector = 'div.item[data-listing_intent="sell"]'
-							await page.locator(selector).first.wait_for(state="attached", timeout=90000)
-
-							prices = await page.locator(selector).evaluate_all(
-								"elements => elements.map(e => e.getAttribute('data-listing_price'))"
-							)
-
-							logger.info(f"[DEBUG] Нашёл {len(prices)} объявлений для {item} (sell): {prices}")
-
-							if self.price_mode == "first":
-								price_texts = prices[:1]
-							elif self.price_mode == "avg23" and len(prices) >= 3:
-								price_texts = prices[1:3]
-							else:
-								price_texts = prices[:1]
-
-							values = []
-							currency = None
-							for pt in price_texts:
-								val, curr = parse_price(pt)
-								if val is not None:
-									values.append(val)
-									if not currency:
-										currency = curr
-
-							if values:
-								avg_value = sum(values) / len(values)
-								rounded_value = round(avg_value, 2)
-								self.cached_sell[item] = rounded_value
-								price_text = f"{rounded_value:.2f} {currency}"
-								source = "SELLOrders"
-								logger.info(f"[Arbitrage] Цена {item} (sell): {price_text} ({source})")
-								results[item] = {
-									"value": rounded_value,
-									"currency": currency,
-									"source": source
-								}
-							else:
-								raise Exception("Не удалось разобрать цены")
-
-					# Если успешно обработали, выходим из retry цикла
+	async def _renew_session(self, session_gen):
+		"""
+		Сессия (логин или cf_clearance) истекла: прогреваем заново. Запросы,
+		получившие отказ в той же сессии, ждут один общий прогрев.
+		False — прогрев в этом run() уже был, а отказ повторился: повторять
+		его (с новой вкладкой и ожиданием логина) бессмысленно.
+		"""
+		async with self._session_lock:
+			if self._session_gen != session_gen:
+				return True  # сессию уже обновил другой запрос
+			if self._session_renewed:
+				return False
+			self._session_renewed = True
+			logger.warning("[Arbitrage] backpack.tf отклонил запрос — сессия истекла, повторяю прогрев")
+			await self._warmup(self._context)
+			self._session_gen += 1
+			return True
+
+	async def _load_classifieds_listings(self, url):
+		"""
+		Загружает classifieds и возвращает {"sell": [...], "buy": [...]}.
+		"""
+		status, body = await self._fetch_html(url)
+		if status >= 400:
+			raise Exception(f"HTTP {status} для {url}")
+		tree = lxml_html.fromstring(body)
+		listings = {"sell": [], "buy": []}
+		for el in _LISTING_XPATH(tree):
+			bucket = listings.get(el.get("data-listing_intent"))
+			if bucket is not None:
+				bucket.append(el.get("data-listing_price"))
+		return listings
+
+	async def _load_stats_listings(self, url):
+		"""
+		Загружает страницу stats и возвращает {"exists": bool, "sell": [...]}.
+		"""
+		status, body = await self._fetch_html(url)
+		if _STATS_NOT_EXIST in body:
+			return {"exists": False, "sell": []}
+		if status >= 400:
+			raise Exception(f"HTTP {status} для {url}")
+		return {"exists": True, "sell": _STATS_SELL_PRICE_XPATH(lxml_html.fromstring(body))}
+
+	async def _cached_prices(self, url, loader):
+		"""
+		Цены страницы url из PriceCache, при промахе — loader(url).
+		Устаревшая, но ещё пригодная запись отдаётся сразу и обновляется в фоне.
+		Одновременные промахи по одному url (например, sell и buy одного предмета)
+		ждут одну общую загрузку.
+		"""
+		prices, age = self.price_cache.get(url)
+		if prices is None:
+			task = self._inflight.get(url)
+			if task is None:
+				task = self._inflight[url] = asyncio.create_task(self._load_into_cache(url, loader))
+			# shield: отмена одного ожидающего не должна отменять загрузку для остальных
+			prices = await asyncio.shield(task)
+		elif age > self.price_cache.fresh_ttl and url not in self._revalidations:
+			self._revalidations[url] = asyncio.create_task(self._revalidate(url, loader))
+		return prices
+
+	async def _load_into_cache(self, url, loader):
+		try:
+			prices = await loader(url)
+			if _has_listings(prices):
+				self.price_cache.set(url, prices)
+			return prices
+		finally:
+			self._inflight.pop(url, None)
+
+	async def _revalidate(self, url, loader):
+		try:
+			prices = await loader(url)
+			# Пустой ответ не должен затирать пригодную устаревшую запись
+			if _has_listings(prices):
+				self.price_cache.set(url, prices)
+		except Exception as e:
+			logger.warning(f"[Arbitrage] Не удалось обновить кэш для {url}: {e}")
+		finally:
+			self._revalidations.pop(url, None)
+
+	async def fetch_prices(self, items, intent):
+		"""
+		Загружает цены для items параллельно; число одновременных запросов и их
+		темп ограничивает _fetch_html.
+		Повторы в items загружаются один раз.
+		"""
+		# Вся чистая подготовка (атрибуты, URL) — заранее, в цикле остаётся только I/O
+		tasks = [
+			FetchTask(item, attrs, _build_url(attrs, intent), intent)
+			for item, attrs in ((item, parse_item_attributes(item)) for item in dict.fromkeys(items))
+		]
+
+		if not tasks:
+			return {}
+		prices = await asyncio.gather(*map(self._fetch_one_with_retry, tasks))
+		return {task.item: price for task, price in zip(tasks, prices)}
+
+	async def _fetch_one_with_retry(self, task):
+		"""
+		_fetch_one с повторами: пауза retry_delay * 2^attempt между попытками.
+		Если все попытки не удались — _EMPTY_PRICE.
+		"""
+		for attempt in range(self.max_retries + 1):
+			try:
+				return await self._fetch_one(task)
+			except Exception as e:
+				if attempt == self.max_retries:
+					logger.error(f"[Arbitrage] Все попытки для {task.item} не удались: {e}")
 					break
-					
-				except Exception as e:
-					# Если контекст/страница закрыты — создаём новую страницу и пробуем ещё раз
-					if _is_closed_error(e):
-						logger.warning(f"[Arbitrage] Страница/контекст закрыты. Пересоздаю страницу и повторяю: {item}")
-						try:
-							# Пересоздаём новую страницу из текущего контекста
-							ctx = page.context
-							page = await ctx.new_page()
-							await page.set_extra_http_headers({"Accept-Language": "en-US,en;q=0.9"})
-							continue
-						except Exception as e2:
-							logger.error(f"[Arbitrage] Не удалось пересоздать страницу: {e2}")
-					# Обычный retry
-					if retry < self.max_retries:
-						logger.warning(f"[Arbitrage] Попытка {retry + 1} для {item} не удалась: {e}")
-						await asyncio.sleep(self.delays["retry"])
-						continue
-					# Финальный фолбек: пробуем classifieds при провале stats или suggested
-					logger.error(f"[Arbitrage] Все попытки для {item} не удались: {e}")
-					try:
-						item_attrs = self._get_cached_attributes(item)
-						item_enc = quote_plus(item_attrs["base_name"])  # classifieds prefer '+' for spaces
-						alt_url = (
-							f"https://backpack.tf/classifieds?item={item_enc}"
-							f"&quality={item_attrs['quality']}&tradable=1&craftable=1&australium={'1' if item_attrs['australium'] else '-1'}&killstreak_tier={item_attrs['killstreak_tier']}"
-						)
-						await page.goto(alt_url, timeout=90000, wait_until="domcontentloaded")
-					except Exception:
-						results[item] = {"value": 0.0, "currency": "unknown", "source": "None"}
-				except Exception:
-					results[item] = {"value": 0.0, "currency": "unknown", "source": "None"}
-		return results
+				delay = self.retry_delay * (2 ** attempt)
+				logger.warning(f"[Arbitrage] Попытка {attempt + 1} для {task.item} не удалась: {e}; повтор через {delay:.1f}с")
+				await asyncio.sleep(delay)
+		return _EMPTY_PRICE
+
+	def _price_texts(self, prices):
+		"""
+		Какие из sell цен (по возрастанию) усреднять: первую ("first")
+		или 2-ю и 3-ю ("avg23", если их хватает).
+		"""
+		if self.price_mode == "avg23" and len(prices) >= 3:
+			return prices[1:3]
+		return prices[:1]
+
+	async def _fetch_one(self, task):
+		"""
+		Одна попытка загрузить цену по FetchTask (основной URL — task.url).
+		Бросает исключение, если цену получить не удалось.
+		"""
+		item, item_attrs, url, intent = task
+		if intent == "buy":
+			logger.info(f"[Arbitrage] Загружаю {item} (buy) через classifieds (scraping only)...")
+
+			logger.info(f"[Arbitrage][BUY] Атрибуты {item}: quality={item_attrs.quality}, killstreak_tier={item_attrs.killstreak_tier}, australium={item_attrs.australium}, base_name='{item_attrs.base_name}'")
+			base_url = url
+
+			# Определяем цену ключа в ref (если не задана в конфиге) один раз за сессию
+			effective_key_ref = await self._ensure_key_price_ref()
+
+			# Один проход по страницам: с каждой сразу берём и sell, и buy (в ключах;
+			# конвертируем ref при необходимости). Buy сверяем с итоговым min sell.
+			scan = _BuyPageScan(effective_key_ref)
+			# Страницы грузим волнами параллельно: чаще всего хватает первых трёх,
+			# 4..5 догружаем, только если условие остановки ещё не выполнено
+			for wave in CLASSIFIEDS_PAGE_WAVES:
+				urls = [base_url if page_num == 1 else f"{base_url}&page={page_num}" for page_num in wave]
+				for url in urls:
+					logger.info(f"[Arbitrage][BUY] URL → {url}")
+				wave_listings = await asyncio.gather(
+					*(self._cached_prices(url, self._load_classifieds_listings) for url in urls)
+				)
+				# any() останавливается на первой странице, после которой листать не нужно
+				if any(scan.add_page(page_num, listings["sell"], listings["buy"]) for page_num, listings in zip(wave, wave_listings)):
+					break
+
+			global_min_sell = scan.global_min_sell
+			if global_min_sell is None:
+				logger.warning(f"[Arbitrage] Нет пригодных SELL объявлений для {item} (keys/конверсия)")
+				return _EMPTY_PRICE
+
+			best_buy = scan.best_buy()
+			if best_buy is not None:
+				logger.info(f"[Arbitrage][BUY] {item}: buy={best_buy:.2f} keys < global min sell={global_min_sell:.2f}")
+				return ItemPrice(round(best_buy, 2), "keys", "ClassifiedsVerified")
+			logger.warning(f"[Arbitrage] Не нашёл buy ниже глобального min sell для {item}")
+			return _EMPTY_PRICE
+
+		else:
+			logger.info(f"[Arbitrage] Загружаю {item} (sell)...")
+
+			logger.info(f"[Arbitrage][SELL] Атрибуты {item}: quality={item_attrs.quality}, killstreak_tier={item_attrs.killstreak_tier}, australium={item_attrs.australium}, base_name='{item_attrs.base_name}'")
+
+			# Определяем, нужно ли использовать classifieds вместо stats
+			use_classifieds = item_attrs.killstreak_tier > 0 or item_attrs.australium
+
+			if use_classifieds:
+				logger.info(f"[Arbitrage] Используем classifieds для {item} (сложные атрибуты)")
+
+				# Получаем sell цены через classifieds (как для buy)
+				logger.info(f"[Arbitrage][SELL] Classifieds URL → {url}")
+				sell_prices = (await self._cached_prices(url, self._load_classifieds_listings))["sell"]
+
+				logger.info(f"[DEBUG] Нашёл {len(sell_prices)} sell объявлений в classifieds для {item}: {sell_prices}")
+
+				rounded_value, currency = _average_price(self._price_texts(sell_prices))
+				if rounded_value is not None:
+					self.cached_sell[item] = rounded_value
+					price_text = f"{rounded_value:.2f} {currency}"
+					source = "ClassifiedsSell"
+					logger.info(f"[Arbitrage] Цена {item} (sell): {price_text} ({source})")
+					return ItemPrice(rounded_value, currency, source)
+				else:
+					raise Exception("Не удалось разобрать цены из classifieds")
+
+			else:
+				logger.info(f"[Arbitrage] Используем stats для {item} (простые атрибуты)")
+
+				# Используем stats для простых предметов
+				logger.info(f"[Arbitrage][SELL] Stats URL → {url}")
+				stats = await self._cached_prices(url, self._load_stats_listings)
+
+				# Если предмета нет на stats, пробуем через classifieds
+				if not stats["exists"]:
+					logger.warning(f"[Arbitrage][SELL] Stats сообщает: 'This item does not seem to exist.' — переключаюсь на classifieds для {item}")
+					class_url = _classifieds_url(item_attrs)
+					logger.info(f"[Arbitrage][SELL] Fallback Classifieds URL → {class_url}")
+					sell_prices_fb = (await self._cached_prices(class_url, self._load_classifieds_listings))["sell"]
+					if sell_prices_fb:
+						logger.info(f"[DEBUG] (FB) Нашёл {len(sell_prices_fb)} sell объявлений для {item}: {sell_prices_fb}")
+						rounded_value, currency = _average_price(sell_prices_fb[:1])
+						if rounded_value is not None:
+							logger.info(f"[Arbitrage] (FB) Цена {item} (sell): {rounded_value} {currency} (ClassifiedsSellFB)")
+							return ItemPrice(rounded_value, currency, "ClassifiedsSellFB")
+						raise Exception("Не удалось разобрать цены из classifieds (FB)")
+					else:
+						logger.warning(f"[Arbitrage][SELL] (FB) Нет sell объявлений для {item}")
+						return _EMPTY_PRICE
+
+				prices = stats["sell"]
+
+				logger.info(f"[DEBUG] Нашёл {len(prices)} объявлений для {item} (sell): {prices}")
+
+				rounded_value, currency = _average_price(self._price_texts(prices))
+				if rounded_value is not None:
+					self.cached_sell[item] = rounded_value
+					price_text = f"{rounded_value:.2f} {currency}"
+					source = "SELLOrders"
+					logger.info(f"[Arbitrage] Цена {item} (sell): {price_text} ({source})")
+					return ItemPrice(rounded_value, currency, source)
+				else:
+					raise Exception("Не удалось разобрать цены")
+
 	
-	async def run(self):
-		start_time = asyncio.get_event_loop().time()
-		results = {"sell": {}, "buy": {}}
-		async with async_playwright() as p:
-			browser = await p.chromium.launch(headless=False, args=["--no-sandbox"])
-			context = await browser.new_context(
+	async def _warmup(self, context):
+		"""
+		Открывает stats первого предмета; если backpack.tf отправил на логин
+		через Steam — ждёт, пока пользователь войдёт в открытом окне.
+		"""
+		page = await self._new_page(context)
+
+		# Прогрев через stats (и логин при необходимости)
+		if self.sell_items:
+			pref_item = self.sell_items[0]
+		elif self.buy_items:
+			pref_item = self.buy_items[0]
+		else:
+			pref_item = "Mann Co. Supply Crate Key"
+
+		# Парсим атрибуты предмета для прогрева (с кэшированием)
+		pref_attrs = parse_item_attributes(pref_item)
+
+		# Строим URL прогрева с учётом всех атрибутов
+		base_warmup = _stats_url(pref_attrs)
+		
+		# Для australium предметов добавляем /Australium
+		if pref_attrs.australium:
+			base_warmup += "/Australium"
+		
+		# Для killstreak предметов добавляем killstreak_tier параметр
+		killstreak_param = ""
+		if pref_attrs.killstreak_tier > 0:
+			killstreak_param = f"&killstreak_tier={pref_attrs.killstreak_tier}"
+		
+		stats_warmup = base_warmup + killstreak_param
+
+		try:
+			await page.goto(stats_warmup, timeout=90000, wait_until="domcontentloaded")
+			if _is_login_url(page.url):
+				logger.info("[Arbitrage][LOGIN] Выполни вход через Steam в открытом окне (после входа бот сам продолжит).")
+				try:
+					await page.wait_for_url("**backpack.tf/stats/**", timeout=180000)
+				except Exception:
+					logger.error("[Arbitrage][LOGIN] Не дождался возврата на stats после логина.")
+				await page.goto(stats_warmup, timeout=90000, wait_until="domcontentloaded")
+		finally:
+			# Страница нужна только для прогрева; при повторных прогревах вкладки не копятся
+			await page.close()
+
+	async def start(self):
+		"""
+		Запускает браузер с постоянным профилем, прогревает сессию (логин при
+		необходимости) и готовит ограничители запросов. Браузер живёт до close(),
+		поэтому повторные run() не платят за запуск Chromium.
+		"""
+		await self._load_config()
+		# Кэши с диска, как и конфиг, читаются в отдельных потоках
+		await asyncio.gather(
+			asyncio.to_thread(self.price_cache.load),
+			asyncio.to_thread(self.key_cache.load),
+		)
+		self._pw = await async_playwright().start()
+		try:
+			# Постоянный профиль: куки, localStorage и HTTP-кэш переживают перезапуск,
+			# поэтому логин через Steam нужен только при первом запуске
+			context = self._context = await self._pw.chromium.launch_persistent_context(
+				str(self.profile_dir),
+				headless=False,
+				args=["--no-sandbox", "--disable-blink-features=AutomationControlled"],
 				user_agent=(
 					"Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
 					"AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -678,135 +1011,126 @@ class UpgradeArbitrage:
 			await context.add_init_script(
 				"Object.defineProperty(navigator, 'webdriver', {get: () => undefined});"
 			)
+			# Не тянем тяжёлые ресурсы — ускоряет domcontentloaded на каждой странице
+			await context.route("**/*", _block_heavy_resources)
 
-			# Куки (если есть)
-			if self.cookies_file.exists():
-				try:
-					raw = json.loads(self.cookies_file.read_text())
-					norm = []
-					for c in raw:
-						c = dict(c)
-						if "expires" in c and not isinstance(c.get("expires"), (int, float)):
-							c.pop("expires")
-						d = c.get("domain")
-						if d and not d.startswith("."):
-							c["domain"] = f".{d}"
-						c.setdefault("sameSite", "Lax")
-						norm.append(c)
-					await context.add_cookies(norm)
-					logger.info("[Arbitrage] Куки подгружены")
-				except Exception as e:
-					logger.error(f"[Arbitrage] Ошибка при загрузке куки: {e}")
-			
-			page = await context.new_page()
-			await page.set_extra_http_headers({"Accept-Language": "en-US,en;q=0.9"})
-			
-			# Оптимизация производительности страницы
-			await page.add_init_script("""
-				// Отключаем ненужные функции для ускорения
-				Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-				Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-				Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
-			""")
-
-			# Прогрев через stats (и логин при необходимости)
-			if self.sell_items:
-				pref_item = self.sell_items[0]
-			elif self.buy_items:
-				pref_item = self.buy_items[0]
+			# Профиль уже залогинен на backpack.tf — прогрев и логин не нужны.
+			# Если сессия на сервере всё же истекла, _fetch_html прогреет заново
+			if _LOGIN_COOKIES <= {c["name"] for c in await context.cookies("https://backpack.tf")}:
+				logger.info("[Arbitrage] Сессия backpack.tf из профиля, прогрев пропущен")
 			else:
-				pref_item = "Mann Co. Supply Crate Key"
-
-			# Парсим атрибуты предмета для прогрева (с кэшированием)
-			pref_attrs = self._get_cached_attributes(pref_item)
-			quality_str = "Strange" if pref_attrs["quality"] == 11 else "Unique"
-			item_name = pref_attrs["base_name"]
-			
-			# Строим URL прогрева с учётом всех атрибутов
-			base_warmup = f"https://backpack.tf/stats/{quality_str}/{quote(item_name, safe='')}/Tradable/Craftable"
-			
-			# Для australium предметов добавляем /Australium
-			if pref_attrs["australium"]:
-				base_warmup += "/Australium"
-			
-			# Для killstreak предметов добавляем killstreak_tier параметр
-			killstreak_param = ""
-			if pref_attrs["killstreak_tier"] > 0:
-				killstreak_param = f"&killstreak_tier={pref_attrs['killstreak_tier']}"
-			
-			stats_warmup = base_warmup + killstreak_param
-
-			await page.goto(stats_warmup, timeout=90000, wait_until="domcontentloaded")
-			if "steamcommunity.com/openid/login" in page.url or "/login" in page.url:
-				logger.info("[Arbitrage][LOGIN] Выполни вход через Steam в открытом окне (после входа бот сам продолжит).")
-				try:
-					await page.wait_for_url("**backpack.tf/stats/**", timeout=180000)
-				except Exception:
-					logger.error("[Arbitrage][LOGIN] Не дождался возврата на stats после логина.")
-				await page.goto(stats_warmup, timeout=90000, wait_until="domcontentloaded")
+				# Куки из cookies.json (например, от cookies_extractor.py) — только для нового профиля
+				if self.cookies_file.exists():
+					try:
+						raw = _json_loads(await asyncio.to_thread(self.cookies_file.read_bytes))
+						norm = []
+						for c in raw:
+							c = dict(c)
+							if "expires" in c and not isinstance(c.get("expires"), (int, float)):
+								c.pop("expires")
+							d = c.get("domain")
+							if d and not d.startswith("."):
+								c["domain"] = f".{d}"
+							c.setdefault("sameSite", "Lax")
+							norm.append(c)
+						await context.add_cookies(norm)
+						logger.info("[Arbitrage] Куки подгружены")
+					except Exception as e:
+						logger.error(f"[Arbitrage] Ошибка при загрузке куки: {e}")
+				await self._warmup(context)
+
+			# Ограничители параллельной загрузки цен: число запросов в полёте и их темп
+			self._slots = asyncio.Semaphore(self.concurrency)
+			self._bucket = _AsyncTokenBucket(rate=self.requests_per_sec, burst=self.concurrency)
+		except BaseException:
+			# Упавший запуск (таймаут прогрева, логин и т.п.) не должен оставлять
+			# открытыми браузер и драйвер Playwright
+			await self.close()
+			raise
+
+	async def close(self):
+		"""
+		Закрывает браузер, открытый в start().
+		"""
+		if self._context is not None:
+			await self._context.close()
+			self._context = None
+		if self._pw is not None:
+			await self._pw.stop()
+			self._pw = None
+		self._slots = None
+		self._bucket = None
 
-			# Сохраняем актуальные куки (best effort)
+	async def run(self):
+		"""
+		Один проход по ценам и апгрейдам на уже запущенном браузере.
+		Если start() не вызывался, браузер поднимается и закрывается здесь же.
+		"""
+		if self._context is None:
+			await self.start()
 			try:
-				sess_cookies = await context.cookies()
-				for c in sess_cookies:
-					if "expires" in c and not isinstance(c.get("expires"), (int, float)):
-						c["expires"] = -1
-				self.cookies_file.write_text(json.dumps(sess_cookies, indent=2))
-			except Exception:
-				pass
-
-			# Основной цикл
-			if not self.focus_upgrade:
-				if self.sell_items:
-					results["sell"] = await self.fetch_prices(page, self.sell_items, "sell")
+				return await self.run()
+			finally:
+				await self.close()
 
-				await asyncio.sleep(self.delays["between_requests"])
-
-				if self.buy_items:
-					results["buy"] = await self.fetch_prices(page, self.buy_items, "buy")
-
-			# Анализ апгрейдов: sell_A + kit < buy_B
+		start_time = asyncio.get_event_loop().time()
+		results = {"sell": {}, "buy": {}}
+		self._session_renewed = False
+		# Цену ключа запрашиваем сразу, параллельно с ценами: иначе анализ апгрейдов
+		# ждал бы её отдельным запросом уже после обоих батчей
+		key_task = asyncio.create_task(self._ensure_key_price_ref())
+		# sell (stats) и buy (classifieds) независимы — грузим одновременно;
+		# общие лимиты держит _fetch_html, цену ключа защищает _key_lock
+		if not self.focus_upgrade:
 			try:
-				# Обеспечим наличие цены ключа
-				if not self.runtime_key_price_ref:
-					try:
-						self.runtime_key_price_ref = await self._detect_key_price_ref(page)
-					except Exception:
-						self.runtime_key_price_ref = None
-				key_ref = self.runtime_key_price_ref or 52.0
-				# Определяем набор предметов и типов китов для апгрейда
-				upgrade_items = self.upgrade_items if self.upgrade_items else (list(set(self.sell_items)) or list(set(self.buy_items)))
-				kit_types = tuple([k for k in self.upgrade_kits if k in ("specialized", "professional")]) or ("specialized", "professional")
-				logger.info(f"[UpgradeCheck] Базовые предметы для апгрейда: {upgrade_items}")
-				logger.info(f"[UpgradeCheck] Типы китов: {list(kit_types)}")
-				upgrade_results = await _analyze_upgrades_for_items(self, page, upgrade_items, key_ref, kit_types)
-				# Сводка
-				profitable = [r for r in upgrade_results if r["profit"]["is_profitable"]]
-				profitable.sort(key=lambda r: r["profit"]["ref"], reverse=True)
-				if profitable:
-					logger.info("[UpgradeCheck] ==== ТОП ВЫГОДНЫХ АПГРЕЙДОВ ====")
-					for r in profitable:
-						logger.info(
-							f"[UpgradeCheck] {r['base_item']} + {r['kit_type']}: +{r['profit']['ref']:.2f} ref (ROI {r['profit']['percent']:.1f}%)"
-						)
-				else:
-					logger.info("[UpgradeCheck] Выгодных апгрейдов не найдено")
-				results["upgrade_opportunities"] = upgrade_results
-				# Полная таблица (все сделки)
-				_print_upgrade_table(upgrade_results)
-				# Сохраняем JSON
-				_save_upgrade_results_json(upgrade_results)
-			except Exception as e:
-				logger.error(f"[UpgradeCheck] Ошибка в анализе апгрейдов: {e}")
-			
-			await browser.close()
-			
-			# Статистика производительности
-			total_time = asyncio.get_event_loop().time() - start_time
-			total_items = len(self.sell_items) + len(self.buy_items)
-			avg_time_per_item = total_time / total_items if total_items > 0 else 0
+				results["sell"], results["buy"] = await asyncio.gather(
+					self.fetch_prices(self.sell_items, "sell"),
+					self.fetch_prices(self.buy_items, "buy"),
+				)
+			except BaseException:
+				# Цена ключа уже никому не нужна — не оставляем задачу висеть
+				key_task.cancel()
+				raise
+
+		# Анализ апгрейдов: sell_A + kit < buy_B
+		try:
+			key_ref = await key_task or 52.0
+			# Определяем набор предметов и типов китов для апгрейда
+			upgrade_items = self.upgrade_items if self.upgrade_items else (self.sell_items or self.buy_items)
+			kit_types = tuple([k for k in self.upgrade_kits if k in ("specialized", "professional")]) or ("specialized", "professional")
+			logger.info(f"[UpgradeCheck] Базовые предметы для апгрейда: {upgrade_items}")
+			logger.info(f"[UpgradeCheck] Типы китов: {list(kit_types)}")
+			upgrade_results = await _analyze_upgrades_for_items(self, upgrade_items, key_ref, kit_types)
+			# Сводка
+			profitable = [r for r in upgrade_results if r["profit"]["is_profitable"]]
+			profitable.sort(key=lambda r: r["profit"]["ref"], reverse=True)
+			if profitable:
+				logger.info("[UpgradeCheck] ==== ТОП ВЫГОДНЫХ АПГРЕЙДОВ ====")
+				for r in profitable:
+					logger.info(
+						f"[UpgradeCheck] {r['base_item']} + {r['kit_type']}: +{r['profit']['ref']:.2f} ref (ROI {r['profit']['percent']:.1f}%)"
+					)
+			else:
+				logger.info("[UpgradeCheck] Выгодных апгрейдов не найдено")
+			results["upgrade_opportunities"] = upgrade_results
+			# Полная таблица (все сделки)
+			_print_upgrade_table(upgrade_results)
+			# Сохраняем JSON
+			_save_upgrade_results_json(upgrade_results)
+		except Exception as e:
+			logger.error(f"[UpgradeCheck] Ошибка в анализе апгрейдов: {e}")
 		
-			logger.info(f"[Arbitrage] Статистика: общее время={total_time:.2f}с, предметов={total_items}, среднее время на предмет={avg_time_per_item:.2f}с")
+		# Дожидаемся фоновых обновлений кэша и сохраняем его на диск в отдельном потоке
+		if self._revalidations:
+			await asyncio.gather(*self._revalidations.values(), return_exceptions=True)
+		await asyncio.to_thread(self.price_cache.save)
+
+		# Статистика производительности
+		total_time = asyncio.get_event_loop().time() - start_time
+		total_items = len(self.sell_items) + len(self.buy_items)
+		avg_time_per_item = total_time / total_items if total_items > 0 else 0
+	
+		logger.info(f"[Arbitrage] Статистика: общее время={total_time:.2f}с, предметов={total_items}, среднее время на предмет={avg_time_per_item:.2f}с")
 		return results
 
 
@@ -833,7 +1157,72 @@ def test_parse_item_attributes():
 	print("=== Тест парсинга атрибутов ===")
 	for item in test_items:
 		attrs = parse_item_attributes(item)
-		print(f"{item:50} → quality={attrs['quality']}, killstreak_tier={attrs['killstreak_tier']}, australium={attrs['australium']}, base_name='{attrs['base_name']}'")
+		print(f"{item:50} → quality={attrs.quality}, killstreak_tier={attrs.killstreak_tier}, australium={attrs.australium}, base_name='{attrs.base_name}'")
+
+
+def test_parse_price():
+	"""
+	Проверяет форматы цен, которые понимает parse_price
+	"""
+	cases = {
+		"40.11 ref": (40.11, "ref"),
+		"40. ref": (40.0, "ref"),
+		".5 ref": (0.5, "ref"),
+		"~1,234 ref": (1234.0, "ref"),
+		"2.33 keys": (2.33, "keys"),
+		"1 key": (1.0, "keys"),
+		"1.5 KEYS": (1.5, "keys"),
+		"1 key, 20 ref": (1.4, "keys"),
+		"20 ref 1 key": (1.4, "keys"),
+		"": (None, None),
+		"abc": (None, None),
+		"40 ref each": (None, None),
+		"1 key 2 ref 3 keys": (None, None),
+	}
+	for text, (value, currency) in cases.items():
+		got_value, got_currency = parse_price(text)
+		assert got_currency == currency, (text, got_currency)
+		if value is None:
+			assert got_value is None, (text, got_value)
+		else:
+			assert abs(got_value - value) < 1e-9, (text, got_value)
+	print("=== parse_price: ок ===")
+
+
+def test_buy_page_scan():
+	"""
+	Проверяет, на какой странице classifieds _BuyPageScan перестаёт листать
+	"""
+	# На первой странице достаточно sell и есть buy ниже min sell
+	scan = _BuyPageScan(50.0)
+	assert scan.add_page(1, ["3 keys", "3.1 keys", "3.2 keys", "3.3 keys", "3.4 keys"], ["2.5 keys", "4 keys"])
+	assert scan.best_buy() == 2.5
+
+	# ref переводится в ключи по key_ref; новых sell нет, лучший buy не вырос
+	scan = _BuyPageScan(50.0)
+	assert not scan.add_page(1, ["150 ref", "140 ref"], ["125 ref"])
+	assert not scan.add_page(2, ["3 keys", "2.9 keys", "3.1 keys"], [])
+	assert scan.add_page(3, ["3 keys"], [])
+	assert scan.global_min_sell == 2.8 and scan.best_buy() == 2.5
+
+	# Sell закончились, buy вплотную к min sell
+	scan = _BuyPageScan(50.0)
+	assert not scan.add_page(1, ["3 keys", "2.8 keys"], ["2.5 keys"])
+	assert scan.add_page(2, ["3 keys"], ["2.795 keys"])
+
+	# Дорогие sell дальше не меняют min sell, но страница подняла buy — листаем дальше
+	scan = _BuyPageScan(50.0)
+	assert not scan.add_page(1, ["3 keys", "2.8 keys"], ["2.5 keys"])
+	assert not scan.add_page(2, ["10 keys", "11 keys", "12 keys"], ["2.7 keys"])
+	assert scan.add_page(3, [], [])
+	assert scan.best_buy() == 2.7
+
+	# Без цены ключа ref-sell не перевести: min sell нет, стоп, когда sell закончились
+	scan = _BuyPageScan(None)
+	assert not scan.add_page(1, ["40 ref"], ["1 key"])
+	assert scan.add_page(2, [], [])
+	assert scan.global_min_sell is None and scan.best_buy() is None
+	print("=== _BuyPageScan: ок ===")
 
 
 def _format_ref(v: float | None) -> str:
@@ -884,4 +1273,6 @@ def _save_upgrade_results_json(upgrade_results: list[dict]):
 
 
 if __name__ == "__main__":
-	test_parse_item_attributes()
\ No newline at end of file
+	test_parse_item_attributes()
+	test_parse_price()
+	test_buy_page_scan()
\ No newline at end of file
@@ -1,8 +1,16 @@
+import functools
+import math
+import random
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
-from typing import Optional, Tuple, List
+from lxml import etree, html as lxml_html
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from config import THROTTLE_SEC
 
 
+@functools.lru_cache(maxsize=4096)
 def _parse_price_to_keys(text: str, key_price_ref: Optional[float]) -> Optional[float]:
     """
     Приводит строку цены к ключам:
@@ -10,6 +18,7 @@ def _parse_price_to_keys(text: str, key_price_ref: Optional[float]) -> Optional[
     - "2.33 keys"
     - "1 key, 6.11 ref"
     Если key_price_ref не задан и цена в ref — возвращает None.
+    Строки цен сильно повторяются между объявлениями, поэтому результат кэшируется.
     """
     if not text:
         return None
@@ -50,6 +59,58 @@ def _parse_price_to_keys(text: str, key_price_ref: Optional[float]) -> Optional[
     return None
 
 
+class _HostRateLimiter:
+    """
+    Token bucket на каждый хост: в среднем не больше `rate` запросов в секунду,
+    с допустимым всплеском до `burst` запросов подряд.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # host -> (tokens, last_ts)
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            wait = (1.0 - tokens) / self.rate if tokens < 1.0 else 0.0
+            # Токен резервируется сразу, ждём уже вне блокировки
+            self._buckets[host] = (tokens - 1.0, now)
+        if wait > 0:
+            time.sleep(wait)
+
+
+# THROTTLE_SEC = 0 означает «без паузы»: ограничиваем снизу, чтобы не делить на ноль
+_RATE_LIMITER = _HostRateLimiter(rate=1.0 / max(THROTTLE_SEC, 0.001))
+
+# Самая долгая пауза между попытками — и для backoff, и для Retry-After сервера
+_MAX_RETRY_DELAY = 30.0
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After из ответа 429/503 (в секундах). HTTP-date не поддерживается — None.
+    """
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _backoff_delay(attempt: int, base: float = 1.0, cap: float = _MAX_RETRY_DELAY) -> float:
+    """
+    Экспоненциальная задержка с джиттером: base * 2^attempt (не больше cap) + [0, 1) сек.
+    """
+    return min(cap, base * (2 ** attempt)) + random.random()
+
+
+_SELL_PRICES_XPATH = etree.XPath('//*[@data-listing_intent="sell"]/@data-listing_price', smart_strings=False)
+_BUY_PRICES_XPATH = etree.XPath('//*[@data-listing_intent="buy"]/@data-listing_price', smart_strings=False)
+
+
 class BackpackClassifiedsHTML:
     BASE_URL = "https://backpack.tf/classifieds?item="
 
@@ -67,23 +128,44 @@ class BackpackClassifiedsHTML:
         "Connection": "keep-alive",
     }
 
+    # 429 и 5xx считаем временными; повторяем с экспоненциальной паузой
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    MAX_ATTEMPTS = 4
+
     def _build_url(self, item_name: str) -> str:
         is_strange = item_name.lower().startswith("strange ")
         quality = 11 if is_strange else 6
-        base_name = item_name.replace("Strange ", "").strip()
+        base_name = (item_name[len("Strange "):] if is_strange else item_name).strip()
         item_enc = base_name.replace(" ", "%20")
         return (
             f"{self.BASE_URL}{item_enc}"
             f"&quality={quality}&tradable=1&craftable=1&australium=-1&killstreak_tier=0"
         )
 
-    def _fetch(self, url: str) -> Optional[str]:
-        try:
-            resp = requests.get(url, headers=self.HEADERS, timeout=30)
-            resp.raise_for_status()
-            return resp.text
-        except Exception:
-            return None
+    def _fetch(self, url: str) -> Optional[bytes]:
+        host = urlsplit(url).hostname or ""
+        for attempt in range(self.MAX_ATTEMPTS):
+            _RATE_LIMITER.acquire(host)
+            retry_after = None
+            try:
+                resp = requests.get(url, headers=self.HEADERS, timeout=30)
+                if resp.status_code in self.RETRY_STATUSES:
+                    retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                else:
+                    resp.raise_for_status()
+                    # Сырые байты: кодировку определит lxml, без лишнего decode в str
+                    return resp.content
+            except (requests.ConnectionError, requests.Timeout):
+                pass
+            except Exception:
+                return None
+
+            if attempt + 1 < self.MAX_ATTEMPTS:
+                if retry_after is not None:
+                    time.sleep(min(retry_after, _MAX_RETRY_DELAY))
+                else:
+                    time.sleep(_backoff_delay(attempt))
+        return None
 
     def get_min_sell_and_verified_buy(
         self,
@@ -100,29 +182,28 @@ class BackpackClassifiedsHTML:
         if not html:
             return None, None
 
-        soup = BeautifulSoup(html, "html.parser")
+        # Цены достаются XPath-ом целиком на стороне lxml (C), без обхода узлов в Python
+        tree = lxml_html.fromstring(html)
+        sell_prices = _SELL_PRICES_XPATH(tree)
+        buy_prices = _BUY_PRICES_XPATH(tree)
 
-        sell_nodes = soup.select('[data-listing_intent="sell"]')
-        buy_nodes = soup.select('[data-listing_intent="buy"]')
+        parse = _parse_price_to_keys
 
-        sell_values_keys: List[float] = []
-        for node in sell_nodes:
-            price_text = node.get("data-listing_price", "")
-            val_keys = _parse_price_to_keys(price_text, key_price_ref)
-            if val_keys is not None:
-                sell_values_keys.append(val_keys)
+        # Один проход без промежуточных списков
+        min_sell_keys = math.inf
+        for price_text in sell_prices:
+            val_keys = parse(price_text, key_price_ref)
+            if val_keys is not None and val_keys < min_sell_keys:
+                min_sell_keys = val_keys
 
-        if not sell_values_keys:
+        if min_sell_keys == math.inf:
             return None, None
 
-        min_sell_keys = min(sell_values_keys)
-
-        buy_values_keys: List[float] = []
-        for node in buy_nodes:
-            price_text = node.get("data-listing_price", "")
-            val_keys = _parse_price_to_keys(price_text, key_price_ref)
-            if val_keys is not None and val_keys < min_sell_keys:
-                buy_values_keys.append(val_keys)
+        best_buy_keys = -math.inf
+        for price_text in buy_prices:
+            val_keys = parse(price_text, key_price_ref)
+            if val_keys is not None and best_buy_keys < val_keys < min_sell_keys:
+                best_buy_keys = val_keys
 
-        verified_buy_keys = max(buy_values_keys) if buy_values_keys else None
+        verified_buy_keys = best_buy_keys if best_buy_keys != -math.inf else None
         return min_sell_keys, verified_buy_keys
\ No newline at end of file
@@ -13,19 +13,23 @@ logger = logging.getLogger("tf2-arbitrage")
 
 async def main():
     arb = UpgradeArbitrage()
-    results = await arb.run()
+    await arb.start()
+    try:
+        results = await arb.run()
+    finally:
+        await arb.close()
 
     print("\n=== Результаты арбитража ===")
 
     if results["sell"]:
         print("\n--- SELL ---")
         for item, data in results["sell"].items():
-            print(f"{item}: {data['value']:.2f} {data['currency']} ({data['source']})")
+            print(f"{item}: {data.value:.2f} {data.currency} ({data.source})")
 
     if results["buy"]:
         print("\n--- BUY ---")
         for item, data in results["buy"].items():
-            print(f"{item}: {data['value']:.2f} {data['currency']} ({data['source']})")
+            print(f"{item}: {data.value:.2f} {data.currency} ({data.source})")
 
 
 if __name__ == "__main__":